@@ -1,12 +1,11 @@
-from dataclasses import dataclass
-
 import numpy as np
 
 DEFAULT_NUMTAPS = 71
 
 
-@dataclass()
 class Equalizer:
+    __slots__ = ('numtaps', 'gain', 'frequencies')
+
     numtaps: int
     gain: np.ndarray
     frequencies: np.ndarray
@@ -14,20 +13,31 @@ class Equalizer:
     def __init__(self, frequencies: np.ndarray, gain_db: np.ndarray,
                  numtaps: int = DEFAULT_NUMTAPS) -> None:
         self.numtaps = numtaps
-        self.gain = np.power(10, gain_db/10)
+        self.gain = np.exp(gain_db*(np.log(10)*0.1))
         self.frequencies = frequencies
         self._validade_frequencies()
         if self.frequencies.size != self.gain.size:
             message = 'gain and frequency arrays must have the same size.'
             raise ValueError(message)
 
+    def __repr__(self) -> str:
+        return (
+            f'Equalizer(numtaps={self.numtaps}, gain={self.gain}, '
+            f'frequencies={self.frequencies})'
+        )
+
+    @staticmethod
+    def polyphase_decompose(taps: np.ndarray,
+                            decimation_factor: int) -> 'list[np.ndarray]':
+        return [taps[k::decimation_factor] for k in range(decimation_factor)]
+
     def _validade_frequencies(self) -> None:
         if self.frequencies.size < 2:
             message = 'frequency array must have at least two frequencies.'
             raise ValueError(message)
         if self.frequencies[0] != 0:
             raise ValueError('frequency array must start with 0.')
-        if np.any(self.frequencies != np.sort(self.frequencies)):
+        if not np.all(np.diff(self.frequencies) >= 0):
             raise ValueError('frequency array must be nondecreasing.')
 
 
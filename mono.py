@@ -1,14 +1,45 @@
+from functools import cached_property, lru_cache
 from pathlib import Path
 from typing import Any, Union, overload, NoReturn
 
 import numpy as np
 import matplotlib.pyplot as plt
+from numba import njit, prange
+from scipy.signal import decimate, firwin2, oaconvolve, resample_poly
 
 from filters.equalizer import Equalizer
 import stereo as s
 
 Number = Union[float, int, np.integer, np.floating]
 
+OVERLAP_ADD_MINIMUM_SIZE = 1 << 15
+MAX_PLOT_POINTS = 8000
+
+
+@lru_cache(maxsize=32)
+def _design_fir(numtaps: int, frequencies: tuple, gain: tuple,
+                nyquist: float) -> np.ndarray:
+    frequencies = np.asarray(frequencies)
+    gain = np.asarray(gain)
+    if nyquist <= frequencies[-1]:
+        below_nyquist = frequencies <= nyquist
+        frequencies = frequencies[below_nyquist]
+        gain = gain[below_nyquist]
+    if nyquist not in frequencies:
+        frequencies = np.append(frequencies, nyquist)
+        gain = np.append(gain, gain[-1])
+    return firwin2(numtaps, frequencies/nyquist, gain)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _fir(x: np.ndarray, h: np.ndarray, y: np.ndarray) -> None:
+    for i in prange(x.size):
+        accumulator = np.float32(0.0)
+        for j in range(h.size):
+            if i >= j:
+                accumulator += h[j]*x[i-j]
+        y[i] = accumulator
+
 
 class MonoChannel:
     audio: np.ndarray
@@ -26,26 +57,46 @@ class MonoChannel:
         if isinstance(audio, Number):
             lenght = audio
             size = lenght*sampling_frequency if is_length else audio
-            audio = np.zeros(size)
+            audio = np.zeros(size, dtype=np.float32)
         elif not isinstance(audio, np.ndarray):
-            message_1 = 'must pass audio as numpy array '
-            message_2 = 'or lenght as a number.'
-            raise TypeError(''.join((message_1, message_2)))
+            raise TypeError(
+                'must pass audio as numpy array or lenght as a number.'
+            )
         if sampling_frequency <= 0:
-            return ValueError('sampling frequency must be a positive number.')
+            raise ValueError('sampling frequency must be a positive number.')
         self.audio = self._validate_audio(audio)
         self.sampling_frequency = sampling_frequency
 
     def _validate_audio(self, audio: np.ndarray) -> np.ndarray:
         if not isinstance(audio, np.ndarray):
             raise TypeError('audio is not a numpy array.')
-        shape = np.array(audio.shape)
-        if np.sum(shape > 1) > 1 and not np.all(shape == 1):
-            message_1 = f'audio data shape {audio.shape} '
-            message_2 = 'cannot be interpreted as a mono channel sound.'
-            message = ''.join((message_1, message_2))
-            raise ValueError(message)
-        return audio.reshape(-1)
+        nontrivial_dimensions = sum(1 for axis in audio.shape if axis > 1)
+        if nontrivial_dimensions > 1:
+            raise ValueError(
+                f'audio data shape {audio.shape} '
+                'cannot be interpreted as a mono channel sound.'
+            )
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        return audio.ravel()
+
+    @classmethod
+    def _from_trusted(cls, audio: np.ndarray,
+                      sampling_frequency: Number) -> 'MonoChannel':
+        channel = cls.__new__(cls)
+        channel.audio = audio
+        channel.sampling_frequency = sampling_frequency
+        return channel
+
+    @classmethod
+    def concat_many(cls, channels: 'list[MonoChannel]') -> 'MonoChannel':
+        total_size = sum(channel.size for channel in channels)
+        dtype = np.result_type(*(channel.audio for channel in channels))
+        full_audio = np.empty(total_size, dtype=dtype)
+        offset = 0
+        for channel in channels:
+            np.copyto(full_audio[offset:offset+channel.size], channel.audio)
+            offset += channel.size
+        return cls._from_trusted(full_audio, channels[0].sampling_frequency)
 
     @property
     def size(self) -> int:
@@ -55,9 +106,10 @@ class MonoChannel:
     def length(self) -> float:
         return self.size/self.sampling_frequency
 
-    @property
-    def time(self) -> float:
-        return np.linspace(0, self.length, self.size)
+    @cached_property
+    def time(self) -> np.ndarray:
+        sampling_period = np.float32(1/self.sampling_frequency)
+        return np.arange(self.size, dtype=np.float32)*sampling_period
 
     def __repr__(self) -> str:
         freq_text = f'Sampling Frequency: {self.sampling_frequency:.0f} Hz'
@@ -73,7 +125,9 @@ class MonoChannel:
     def __getitem__(self, key):
         if isinstance(key, slice):
             audio_slice = self.audio[key.start:key.stop:key.step]
-            return MonoChannel(audio_slice, self.sampling_frequency)
+            return MonoChannel._from_trusted(
+                audio_slice, self.sampling_frequency
+            )
         else:
             return self.audio[key]
 
@@ -85,25 +139,19 @@ class MonoChannel:
         pass
     def __sub__(self, other):
         if not isinstance(other, (s.StereoSound, MonoChannel)):
-            message = f"can't merge MonoChannel and {type(other).__name__}."
-            raise TypeError(message)
-        if self.sampling_frequency != other.sampling_frequency:
-            message_21 = 'cannot merge two audios with '
-            message_22 = 'different sampling frequencies.'
-            message = ''.join((message_21, message_22))
-            raise ValueError(message)
-        if isinstance(other, s.StereoSound):
-            left_channel = MonoChannel(
-                np.concatenate((self.audio, other.left_channel.audio)),
-                self.sampling_frequency
+            raise TypeError(
+                f"can't merge MonoChannel and {type(other).__name__}."
             )
-            right_channel = MonoChannel(
-                np.concatenate((self.audio, other.right_channel.audio)),
-                self.sampling_frequency
+        if self.sampling_frequency != other.sampling_frequency:
+            raise ValueError(
+                'cannot merge two audios with '
+                'different sampling frequencies.'
             )
+        if isinstance(other, s.StereoSound):
+            left_channel = MonoChannel.concat_many([self, other.left_channel])
+            right_channel = MonoChannel.concat_many([self, other.right_channel])
             return s.StereoSound((left_channel, right_channel))
-        full_audio = np.concatenate((self.audio, other.audio))
-        return MonoChannel(full_audio, self.sampling_frequency)
+        return MonoChannel.concat_many([self, other])
 
     @overload
     def __floordiv__(self, other: 'MonoChannel') -> 'MonoChannel':
@@ -113,58 +161,59 @@ class MonoChannel:
         pass
     def __floordiv__(self, other):
         if not isinstance(other, (s.StereoSound, MonoChannel)):
-            message_11 = f"can't overlap MonoChannel and "
-            message_12 = f'{type(other).__name__}'
-            raise TypeError(''.join((message_11, message_12)))
+            raise TypeError(
+                f"can't overlap MonoChannel and {type(other).__name__}"
+            )
         if self.sampling_frequency != other.sampling_frequency:
-            message_21 = 'cannot overlap two audios with '
-            message_22 = 'different sampling frequencies.'
-            message = ''.join((message_21, message_22))
+            raise ValueError(
+                'cannot overlap two audios with '
+                'different sampling frequencies.'
+            )
         bigger_size = max(self.size, other.size)
-        padded_self = self.add_padding(
-            bigger_size - self.size, is_right_padding=True
-        )
-        padded_other = other.add_padding(
-            bigger_size - other.size, is_right_padding=True
-        )
         if isinstance(other, s.StereoSound):
-            left_channel = MonoChannel(
-                padded_self.audio + padded_other.left_channel.audio,
-                self.sampling_frequency
+            overlapped = np.zeros(
+                (2, bigger_size), dtype=np.result_type(self.audio, other.data)
             )
-            right_channel = MonoChannel(
-                padded_self.audio + padded_other.right_channel.audio,
-                self.sampling_frequency
+            overlapped[:, :self.size] = self.audio
+            overlapped[:, :other.size] += other.data
+            return s.StereoSound._from_trusted(
+                overlapped, self.sampling_frequency
             )
-            return s.StereoSound((left_channel, right_channel))
-        overlapped_audio = padded_self.audio + padded_other.audio
-        return MonoChannel(overlapped_audio, self.sampling_frequency)
+        overlapped = np.zeros(
+            bigger_size, dtype=np.result_type(self.audio, other.audio)
+        )
+        overlapped[:self.size] = self.audio
+        overlapped[:other.size] += other.audio
+        return MonoChannel._from_trusted(overlapped, self.sampling_frequency)
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, MonoChannel):
             return False
-        equal_audio = np.all(self.audio == other.audio)
-        equal_frequency = self.sampling_frequency == other.sampling_frequency
-        return equal_audio and equal_frequency
+        if self.sampling_frequency != other.sampling_frequency:
+            return False
+        if self.size != other.size:
+            return False
+        return np.array_equal(self.audio, other.audio)
 
     def add_padding(
             self, ammount: int,
             is_right_padding: bool = False,
             is_lenght = False) -> 'MonoChannel':
-        padding_audio = MonoChannel(
-            ammount, self.sampling_frequency, is_length=is_lenght
+        if is_lenght:
+            ammount = int(ammount*self.sampling_frequency)
+        pad = (0, ammount) if is_right_padding else (ammount, 0)
+        return MonoChannel._from_trusted(
+            np.pad(self.audio, pad), self.sampling_frequency
         )
-        if is_right_padding:
-            return self - padding_audio
-        return padding_audio - self
 
     def to_stereo(self) -> 's.StereoSound':
         return s.StereoSound((self, self))
 
     def plot_audio(self, start: float = 0, stop: float = None) -> None:
         frame = self.time_frame(start, stop)
+        step = max(1, frame.size//MAX_PLOT_POINTS)
         plt.figure()
-        plt.plot(frame.time, frame.audio)
+        plt.plot(frame.time[::step], frame.audio[::step])
         plt.show()
 
     def time_frame(self, start: float, stop: float = None) -> 'MonoChannel':
@@ -176,14 +225,32 @@ class MonoChannel:
         time_slice = slice(start_index, stop_index)
         return self[time_slice]
 
-    def filter_audio(self, filter: Equalizer) -> 'MonoChannel':
-        nyquist = self.sampling_frequency/2
-        frequencies = filter.frequencies
-        if nyquist <= frequencies[-1]:
-            high_frequencies = high_frequencies[frequencies > nyquist]
-            frequencies = frequencies[frequencies <= nyquist]
-            high_freq_gain = gain.copy()
-            high_freq_gain = high_freq_gain[frequencies > nyquist]
-            gain = filter.gain[frequencies <= nyquist]
-        if nyquist not in frequencies:
-            frequencies = np.append(frequencies, nyquist)
+    def filter_audio(self, filter: Equalizer,
+                     decimation_factor: int = 1) -> 'MonoChannel':
+        if decimation_factor > 1:
+            decimated_audio = decimate(self.audio, decimation_factor)
+            decimated = MonoChannel._from_trusted(
+                np.ascontiguousarray(decimated_audio, dtype=np.float32),
+                self.sampling_frequency/decimation_factor
+            )
+            filtered = decimated.filter_audio(filter)
+            restored = resample_poly(filtered.audio, decimation_factor, 1)
+            restored = np.ascontiguousarray(
+                restored[:self.size], dtype=np.float32
+            )
+            return MonoChannel._from_trusted(
+                restored, self.sampling_frequency
+            )
+        taps = _design_fir(
+            filter.numtaps, tuple(filter.frequencies), tuple(filter.gain),
+            self.sampling_frequency/2
+        )
+        x = np.ascontiguousarray(self.audio, dtype=np.float32)
+        h = np.ascontiguousarray(taps, dtype=np.float32)
+        if x.size >= OVERLAP_ADD_MINIMUM_SIZE:
+            y = oaconvolve(x, h, mode='full')[:x.size]
+            y = y.astype(np.float32, copy=False)
+        else:
+            y = np.empty_like(x)
+            _fir(x, h, y)
+        return MonoChannel(y, self.sampling_frequency)
@@ -1,19 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Union, Tuple, overload
 
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.io import wavfile
+from scipy.signal import oaconvolve
 
+from filters.equalizer import Equalizer
 import mono as m
 
 Sound = Union['StereoSound', 'm.MonoChannel']
 MonoChannelTuple = Tuple['m.MonoChannel', 'm.MonoChannel']
 
+PARALLEL_FILTER_MINIMUM_BYTES = 1 << 23
+
 
 class StereoSound:
-    left_channel: 'm.MonoChannel'
-    right_channel: 'm.MonoChannel'
+    __slots__ = ('data', 'sampling_frequency', '_size', '_length')
+
+    data: np.ndarray
     sampling_frequency: 'm.Number'
 
     @overload
@@ -25,46 +31,69 @@ class StereoSound:
     def __init__(self, audio):
         if isinstance(audio, Path):
             sampling_frequency, data = wavfile.read(audio, 'r')
-            self.left_channel = m.MonoChannel(data[:, 0], sampling_frequency)
-            self.right_channel = m.MonoChannel(data[:, 1], sampling_frequency)
+            self.data = np.ascontiguousarray(data.T, dtype=np.float32)
             self.sampling_frequency = sampling_frequency
         elif not isinstance(audio, tuple):
-            message_11 = 'cannot instantiate class with parameters provided. '
-            message_12 = 'Can only take path to .wav file or tuple containing'
-            message_13 = ' left and right channels as MonoChannel instances.'
-            raise TypeError(''.join((message_11, message_12, message_13)))
+            raise TypeError(
+                'cannot instantiate class with parameters provided. '
+                'Can only take path to .wav file or tuple containing'
+                ' left and right channels as MonoChannel instances.'
+            )
         else:
             correct_tuple_types = (
                 isinstance(audio[0], m.MonoChannel)
                 and isinstance(audio[1], m.MonoChannel)
             )
             if not correct_tuple_types or len(audio) != 2:
-                message_21 = 'tuple given must contain exactly two '
-                message_22 = 'instances of MonoChannel class.'
-                raise ValueError(''.join((message_21, message_22)))
+                raise ValueError(
+                    'tuple given must contain exactly two '
+                    'instances of MonoChannel class.'
+                )
             left_channel, right_channel = audio[0], audio[1]
             if left_channel.length != right_channel.length:
                 raise ValueError('channels cannot have different lengths.')
             self.sampling_frequency = left_channel.sampling_frequency
             if self.sampling_frequency != right_channel.sampling_frequency:
-                message_31 = 'channels cannot have different '
-                message_32 = 'sampling frequencies.'
-                raise ValueError(''.join((message_31, message_32)))
-            self.left_channel = left_channel
-            self.right_channel = right_channel
+                raise ValueError(
+                    'channels cannot have different sampling frequencies.'
+                )
+            self.data = np.stack((left_channel.audio, right_channel.audio))
+        self._size = int(self.data.shape[1])
+        self._length = self._size/self.sampling_frequency
+
+    @classmethod
+    def _from_trusted(cls, data: np.ndarray,
+                      sampling_frequency: 'm.Number') -> 'StereoSound':
+        sound = cls.__new__(cls)
+        sound.data = data
+        sound.sampling_frequency = sampling_frequency
+        sound._size = int(data.shape[1])
+        sound._length = sound._size/sampling_frequency
+        return sound
+
+    @property
+    def left_channel(self) -> 'm.MonoChannel':
+        return m.MonoChannel._from_trusted(
+            self.data[0], self.sampling_frequency
+        )
+
+    @property
+    def right_channel(self) -> 'm.MonoChannel':
+        return m.MonoChannel._from_trusted(
+            self.data[1], self.sampling_frequency
+        )
 
     @property
     def size(self) -> int:
-        return int(self.left_channel.size)
+        return self._size
 
     @property
     def length(self) -> float:
-        return self.left_channel.length
+        return self._length
 
     @property
-    def time(self) -> float:
-        index_size = self.size
-        return np.linspace(0, self.length, index_size)
+    def time(self) -> np.ndarray:
+        return self.left_channel.time
     
     def __repr__(self) -> str:
         freq_text = f'Sampling Frequency: {self.sampling_frequency:.0f} Hz'
@@ -74,14 +103,14 @@ class StereoSound:
 
     def __sub__(self, other: Sound) -> 'StereoSound':
         if not isinstance(other, (StereoSound, m.MonoChannel)):
-            message_11 = f'cannot merge StereoSound and '
-            message_12 = f"{type(other).__name__}."
-            raise TypeError(''.join((message_11, message_12)))
+            raise TypeError(
+                f'cannot merge StereoSound and {type(other).__name__}.'
+            )
         if self.sampling_frequency != other.sampling_frequency:
-            message_21 = 'cannot merge two audios with '
-            message_22 = 'different sampling frequencies.'
-            message = ''.join((message_21, message_22))
-            raise ValueError(message)
+            raise ValueError(
+                'cannot merge two audios with '
+                'different sampling frequencies.'
+            )
         if isinstance(other, m.MonoChannel):
             stereo_other = other.to_stereo()
         left_channel = self.left_channel - stereo_other.left_channel
@@ -90,56 +119,50 @@ class StereoSound:
 
     def __floordiv__(self, other: Sound) -> 'StereoSound':
         if not isinstance(other, (StereoSound, m.MonoChannel)):
-            message_11 = f"can't overlap StereoSound and "
-            message_12 = f'{type(other).__name__}'
-            raise TypeError(''.join((message_11, message_12)))
+            raise TypeError(
+                f"can't overlap StereoSound and {type(other).__name__}"
+            )
         if self.sampling_frequency != other.sampling_frequency:
-            message_21 = 'cannot overlap two audios with '
-            message_22 = 'different sampling frequencies.'
-            message = ''.join((message_21, message_22))
+            raise ValueError(
+                'cannot overlap two audios with '
+                'different sampling frequencies.'
+            )
         bigger_size = max(self.size, other.size)
-        padded_self = self.add_padding(
-            bigger_size - self.size, is_right_padding=True
-        )
-        padded_other = other.add_padding(
-            bigger_size - other.size, is_right_padding=True
+        other_data = (
+            other.audio if isinstance(other, m.MonoChannel) else other.data
         )
-        if isinstance(other, m.MonoChannel):
-            padded_other = padded_other.to_stereo()
-        left_channel = m.MonoChannel(
-            padded_self.left_channel.audio+padded_other.left_channel.audio,
-            self.sampling_frequency
-        )
-        right_channel = m.MonoChannel(
-            padded_self.right_channel.audio+padded_other.right_channel.audio,
-            self.sampling_frequency
+        overlapped = np.zeros(
+            (2, bigger_size), dtype=np.result_type(self.data, other_data)
         )
-        return StereoSound((left_channel, right_channel))
+        overlapped[:, :self.size] = self.data
+        overlapped[:, :other.size] += other_data
+        return StereoSound._from_trusted(overlapped, self.sampling_frequency)
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, StereoSound):
             return False
-        equal_left_channel = self.left_channel == other.left_channel
-        equal_right_channel = self.right_channel == other.right_channel
-        equal_frequency = self.sampling_frequency == other.sampling_frequency
-        return equal_left_channel and equal_right_channel and equal_frequency
+        if self.sampling_frequency != other.sampling_frequency:
+            return False
+        if self.size != other.size:
+            return False
+        return np.array_equal(self.data, other.data)
 
     def add_padding(
             self, ammount: int,
             is_right_padding: bool = False,
             is_lenght = False) -> 'StereoSound':
-        padding_audio = m.MonoChannel(
-            ammount, self.sampling_frequency, is_length=is_lenght
+        if is_lenght:
+            ammount = int(ammount*self.sampling_frequency)
+        pad = (0, ammount) if is_right_padding else (ammount, 0)
+        return StereoSound._from_trusted(
+            np.pad(self.data, ((0, 0), pad)), self.sampling_frequency
         )
-        if is_right_padding:
-            return self - padding_audio
-        return padding_audio - self
 
     def to_mono(self) -> 'm.MonoChannel':
-        left_audio = self.left_channel.audio
-        right_audio = self.right_channel.audio
-        audio = (left_audio + right_audio) / 2
-        return m.MonoChannel(audio, self.sampling_frequency)
+        audio = np.empty(self.size, dtype=np.float32)
+        np.add(self.data[0], self.data[1], out=audio)
+        audio *= np.float32(0.5)
+        return m.MonoChannel._from_trusted(audio, self.sampling_frequency)
 
     def make_channels_equal(self) -> 'StereoSound':
         mono = self.to_mono()
@@ -147,9 +170,11 @@ class StereoSound:
 
     def plot_audio(self, start: float = 0, stop: float = None) -> None:
         frame = self.time_frame(start, stop)
+        step = max(1, frame.size//m.MAX_PLOT_POINTS)
+        time = frame.time[::step]
         plt.figure()
-        plt.plot(frame.time, frame.left_channel.audio)
-        plt.plot(frame.time, frame.right_channel.audio)
+        plt.plot(time, frame.data[0, ::step])
+        plt.plot(time, frame.data[1, ::step])
         plt.show()
 
     def time_frame(self, start: float, stop: float = None) -> 'StereoSound':
@@ -157,17 +182,38 @@ class StereoSound:
         right_channel = self.right_channel.time_frame(start, stop)
         return StereoSound((left_channel, right_channel))
 
+    def filter_audio(self, filter: Equalizer) -> 'StereoSound':
+        taps = m._design_fir(
+            filter.numtaps, tuple(filter.frequencies), tuple(filter.gain),
+            self.sampling_frequency/2
+        )
+        h = np.ascontiguousarray(taps, dtype=np.float32)
+        if self.data.nbytes >= PARALLEL_FILTER_MINIMUM_BYTES:
+            with ThreadPoolExecutor(2) as executor:
+                futures = [
+                    executor.submit(oaconvolve, channel, h, 'full')
+                    for channel in self.data
+                ]
+                filtered = np.stack(
+                    [future.result()[:self.size] for future in futures]
+                )
+        else:
+            filtered = oaconvolve(
+                self.data, h[np.newaxis, :], mode='full', axes=1
+            )[:, :self.size]
+        filtered = np.ascontiguousarray(filtered, dtype=np.float32)
+        return StereoSound._from_trusted(filtered, self.sampling_frequency)
+
     def save(self, filepath: Path) -> None:
-        left_data = self.left_channel.audio[np.newaxis, :]
-        right_data = self.right_channel.audio[np.newaxis, :]
-        data = np.concatenate((left_data, right_data), axis=0).T
-        data = data*np.iinfo(np.int16).max/np.abs(data).max()
-        data = data.astype(np.int16)
+        scale = np.float32(np.iinfo(np.int16).max/np.abs(self.data).max())
+        data = np.multiply(self.data.T, scale)
+        np.rint(data, out=data)
+        data = data.astype(np.int16, copy=False)
         wavfile.write(filepath, self.sampling_frequency, data)
 
 
 def test():
-    from scipy.signal import firwin2, tf2sos, sosfiltfilt, sosfreqz
+    from scipy.signal import firwin2, filtfilt, freqz
 
     filepath = Path(r'audios/see-you-later-203103.wav')
     sampling_frequency, audio = wavfile.read(filepath, 'r')
@@ -186,17 +232,20 @@ def test():
     print(gain)
     fir_filter = firwin2(71, frequencies, gain, antisymmetric=False)
     print(fir_filter)
-    fir_filter_sos = tf2sos(fir_filter, 1)
-    filtered_audio_left = sosfiltfilt(fir_filter_sos, left_channel.audio)
+    filtered_audio_left = filtfilt(
+        fir_filter, [1.0], left_channel.audio, method='gust'
+    )
     filtered_left = m.MonoChannel(filtered_audio_left, sampling_frequency)
-    filtered_audio_right = sosfiltfilt(fir_filter_sos, right_channel.audio)
+    filtered_audio_right = filtfilt(
+        fir_filter, [1.0], right_channel.audio, method='gust'
+    )
     filtered_right = m.MonoChannel(filtered_audio_right, sampling_frequency)
     filtered_sound = StereoSound((filtered_left, filtered_right))
     filepath_write = Path(r'audios/see_you_later_filtered.wav')
     print(filtered_sound == stereo_tuple)
     filtered_sound.save(filepath_write)
 
-    w, h = sosfreqz(fir_filter_sos, worN=1500)
+    w, h = freqz(fir_filter, worN=1500)
     plt.subplot(2, 1, 1)
     db = 20*np.log10(np.maximum(np.abs(h), 1e-5))
     plt.plot(w/np.pi, db)